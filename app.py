@@ -1,14 +1,25 @@
+import itertools
+import json
 import logging
 import os
-from typing import Any, Dict, List
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-import pytesseract
+# Pages are processed in parallel, so keep Tesseract single-threaded to avoid
+# OpenMP oversubscription. This must be set before tesserocr loads OpenMP.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+import httpx
 from dotenv import load_dotenv
 from groq import Groq
-from pdf2image import convert_from_path
-from PIL import Image
+from tesserocr import PyTessBaseAPI
 
-from processor.image import encode_image_to_base64
+from constants.patterns import Patterns
+from processor.cache import cached_completion
+from processor.image import encode_image_for_llm, preprocess_for_ocr
+from processor.pdf import iter_pdf_image_chunks
 from processor.text import format_markdown
 
 load_dotenv()
@@ -22,13 +33,75 @@ logger = logging.getLogger(__name__)
 ###################### Groq ######################
 groq_model = "meta-llama/llama-4-maverick-17b-128e-instruct"
 groq_api_key = os.environ.get("GROQ_API_KEY")
+groq_max_connections = 32
+groq_timeout = 60.0
+groq_max_tokens = 8192
+# Output token estimates: ~4 characters per token, scaled by how much longer
+# the output is expected to be than the input
+MARKDOWN_EXPANSION = 1.5
+TRANSLATION_EXPANSION = 1.8
+MIN_COMPLETION_TOKENS = 1024
+_client = None
+_client_lock = threading.Lock()
+
+###################### Concurrency ######################
+MAX_WORKERS = 16
+OCR_WORKERS = os.cpu_count() or 1
+MARKDOWN_BATCH_SIZE = 4
+TRANSLATION_BATCH_SIZE = 4
+
+
+###################### Tesseract ######################
+tesseract_lang = "eng"
+# Pages whose mean OCR word confidence reaches this value skip the feedback loop
+ocr_confidence_threshold = float(os.environ.get("OCR_CONFIDENCE_THRESHOLD", "85"))
+_tess_local = threading.local()
+
+
+def _get_client() -> Groq:
+    """Return a shared Groq client so the HTTP connection pool is reused.
+
+    Creation is locked so concurrent first calls from worker threads share one client.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            http_client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=groq_max_connections,
+                    max_keepalive_connections=groq_max_connections,
+                ),
+                timeout=httpx.Timeout(groq_timeout),
+            )
+            _client = Groq(api_key=groq_api_key, http_client=http_client)
+    return _client
+
+
+def _get_tess_api() -> PyTessBaseAPI:
+    """Return this thread's Tesseract API, loading the language model once."""
+    api = getattr(_tess_local, "api", None)
+    if api is None:
+        api = PyTessBaseAPI(lang=tesseract_lang)
+        _tess_local.api = api
+    return api
+
+
+def ocr_image_with_confidence(image_path: str) -> Tuple[str, float]:
+    """Perform OCR on the image and return the text and mean word confidence."""
+    logger.info(f"Performing OCR on image: {image_path}")
+    api = _get_tess_api()
+    # Pass raw pixels so no intermediate image file is encoded and decoded
+    image = preprocess_for_ocr(image_path)
+    height, width = image.shape
+    api.SetImageBytes(image.tobytes(), width, height, 1, width)
+    text = api.GetUTF8Text()
+    return text, api.MeanTextConf()
 
 
 def ocr_image(image_path: str) -> str:
     """Perform OCR on the image and return the extracted text."""
-    logger.info(f"Performing OCR on image: {image_path}")
-    image = Image.open(image_path)
-    return pytesseract.image_to_string(image)
+    return ocr_image_with_confidence(image_path)[0]
 
 
 def ai_read_image(image_path: str) -> str:
@@ -43,38 +116,76 @@ def ai_read_image(image_path: str) -> str:
     return groq_completion(prepare_messages(prompt, content, image_path))
 
 
+def image_content_block(image_path: str) -> Dict[str, Any]:
+    """Build an image_url content block for the Groq API."""
+    base64_image = encode_image_for_llm(image_path)
+    return {
+        "type": "image_url",
+        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
+    }
+
+
 def prepare_messages(
     prompt: str, content: str, image_path: str = None
 ) -> List[Dict[str, Any]]:
-    """Prepares the messages to send to the Groq API."""
-    messages = [
-        {"role": "user", "content": prompt},
-        {"role": "user", "content": content},
-    ]
+    """Prepares the messages to send to the Groq API.
+
+    The image goes first so every request for a page shares the same prefix,
+    which lets the server reuse its cached prompt prefix for the image tokens.
+    """
+    messages = []
     if image_path:
-        base64_image = encode_image_to_base64(image_path)
-        messages.append(
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                    }
-                ],
-            }
-        )
+        messages.append({"role": "user", "content": [image_content_block(image_path)]})
+    messages.extend(
+        [
+            {"role": "user", "content": prompt},
+            {"role": "user", "content": content},
+        ]
+    )
     return messages
 
 
-def groq_completion(messages: List[Dict[str, Any]]) -> str:
+def estimate_max_tokens(text: str, expansion: float = MARKDOWN_EXPANSION) -> int:
+    """Estimate an output token budget from the size of the input text."""
+    estimate = int(len(text) * expansion / 4) + 256
+    return max(MIN_COMPLETION_TOKENS, min(groq_max_tokens, estimate))
+
+
+def estimate_batch_max_tokens(
+    texts: List[str], expansion: float = MARKDOWN_EXPANSION
+) -> int:
+    """Estimate an output token budget for several pages returned in one response."""
+    estimate = sum(estimate_max_tokens(text, expansion) for text in texts)
+    return min(groq_max_tokens, estimate)
+
+
+def token_budget_chunks(
+    texts: List[str], max_size: int, expansion: float = MARKDOWN_EXPANSION
+) -> List[slice]:
+    """Split texts into runs of at most `max_size` whose summed output estimate fits in one response."""
+    chunks = []
+    start, budget = 0, 0
+    for i, text in enumerate(texts):
+        estimate = estimate_max_tokens(text, expansion)
+        if i > start and (i - start == max_size or budget + estimate > groq_max_tokens):
+            chunks.append(slice(start, i))
+            start, budget = i, 0
+        budget += estimate
+    if start < len(texts):
+        chunks.append(slice(start, len(texts)))
+    return chunks
+
+
+@cached_completion(groq_model)
+def groq_completion(
+    messages: List[Dict[str, Any]], *, max_tokens: int = groq_max_tokens
+) -> str:
     """Get completion from Groq API."""
     logger.info("Sending request to Groq API")
-    groq = Groq(api_key=groq_api_key)
-    completion = groq.chat.completions.create(
+    completion = _get_client().chat.completions.create(
         model=groq_model,
         messages=messages,
-        max_tokens=8192,
+        max_tokens=max_tokens,
     )
     return completion.choices[0].message.content
 
@@ -84,7 +195,35 @@ def initial_markdown_conversion(text: str, image_path: str = None) -> str:
     logger.info("Performing initial markdown conversion")
     prompt = "Convert the following text to markdown format, preserving structure and formatting:"
     messages = prepare_messages(prompt, text, image_path)
-    return groq_completion(messages)
+    return groq_completion(messages, max_tokens=estimate_max_tokens(text))
+
+
+def initial_markdown_conversion_batch(
+    texts: List[str], image_paths: List[str]
+) -> List[str]:
+    """Perform initial markdown conversion for several pages in one Groq request."""
+    logger.info(f"Performing initial markdown conversion for {len(texts)} pages")
+    prompt = f"""
+    Convert each of the following {len(texts)} pages to markdown format, preserving structure and formatting.
+    Each page is given as its text followed by its image, in page order.
+    Return only a JSON array of {len(texts)} markdown strings in page order, with no explanation text.
+    """
+    content = []
+    for i, (text, image_path) in enumerate(zip(texts, image_paths)):
+        content.append({"type": "text", "text": f"Page {i + 1}:\n{text}"})
+        content.append(image_content_block(image_path))
+    messages = [
+        {"role": "user", "content": prompt},
+        {"role": "user", "content": content},
+    ]
+    max_tokens = estimate_batch_max_tokens(texts)
+    response = groq_completion(messages, max_tokens=max_tokens)
+    markdowns = json.loads(format_markdown(response.strip()))
+    if not isinstance(markdowns, list) or len(markdowns) != len(texts):
+        raise ValueError(f"Expected a JSON array of {len(texts)} markdown strings")
+    if not all(isinstance(markdown, str) for markdown in markdowns):
+        raise ValueError("Expected every item of the JSON array to be a string")
+    return markdowns
 
 
 def feedback_loop(original_text: str, markdown: str, image_path: str = None) -> str:
@@ -101,7 +240,7 @@ def feedback_loop(original_text: str, markdown: str, image_path: str = None) ->
     {markdown}
     """
     messages = prepare_messages(prompt, "Provide feedback for improvement")
-    feedback = groq_completion(messages)
+    feedback = groq_completion(messages, max_tokens=estimate_max_tokens(markdown))
     logger.info(f"Feedback received: {feedback[:100]}...")
 
     # Use the feedback to improve the markdown
@@ -115,7 +254,7 @@ def feedback_loop(original_text: str, markdown: str, image_path: str = None) ->
     messages = prepare_messages(
         improve_prompt, "Improve the markdown based on feedback", image_path
     )
-    return groq_completion(messages)
+    return groq_completion(messages, max_tokens=estimate_max_tokens(markdown))
 
 
 def meta_reasoning(
@@ -159,14 +298,10 @@ def create_final_version(optimized_markdown: str, image_path: str) -> str:
     REMEMBER: The final output should only be the markdown, That matches the original page text with no additional text or explanations.
     """
     messages = prepare_messages(prompt, "Create final version", image_path)
-    return groq_completion(messages)
+    return groq_completion(messages, max_tokens=estimate_max_tokens(optimized_markdown))
 
 
-def translate_page(
-    content: str, image_path: str, target_language: str, output_path: str
-) -> str:
-    """Prepares the messages to send to the Groq API."""
-    system_prompt = """You are a professional translator.
+TRANSLATOR_SYSTEM_PROMPT = """You are a professional translator.
             **Translator Instructions**
             - Translate the given content into the target language
             - Return **only the translated text**; avoid additional explanations
@@ -174,55 +309,138 @@ def translate_page(
             - **Do not** engage in dialogue or answer user queries—your sole role is to translate
             - Maintain strict adherence to formatting (e.g., preserve **bold**, *italics* ... etc).
             > *Note:* All responses should focus exclusively on translation quality without deviations."""
+
+
+def translate_page(
+    content: str, image_path: str, target_language: str, output_path: str
+) -> str:
+    """Prepares the messages to send to the Groq API."""
+    system_prompt = TRANSLATOR_SYSTEM_PROMPT
     user_prompt = f"Translate the following text to {target_language}, preserving all formatting and structure"
     messages = [
         {
             "role": "system",
             "content": system_prompt,
         },
-        {"role": "user", "content": user_prompt},
-        {"role": "user", "content": content},
     ]
     if image_path:
-        base64_image = encode_image_to_base64(image_path)
-        messages.append(
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                    }
-                ],
-            }
-        )
-    translated_content = groq_completion(messages)
+        messages.append({"role": "user", "content": [image_content_block(image_path)]})
+    messages.extend(
+        [
+            {"role": "user", "content": user_prompt},
+            {"role": "user", "content": content},
+        ]
+    )
+    translated_content = groq_completion(
+        messages, max_tokens=estimate_max_tokens(content, TRANSLATION_EXPANSION)
+    )
     with open(output_path, "w") as f:
         f.write(translated_content)
     return translated_content
 
 
-def process_page(image_path: str, output_path: str) -> str:
-    """Process a single page of a PDF"""
+def translate_texts_batch(
+    texts: List[str], image_paths: List[str], target_language: str
+) -> List[str]:
+    """Translate several pages in one Groq request, delimited by <<<PAGE n>>> markers.
+
+    Each page's image follows its text, as in `translate_page`.
+    """
+    logger.info(f"Translating {len(texts)} pages to {target_language}")
+    user_prompt = f"""
+    Translate each of the following {len(texts)} pages to {target_language}, preserving all formatting and structure.
+    Each page starts with a <<<PAGE n>>> line and is followed by its image. Return every translated page after the same <<<PAGE n>>> line, in the same order.
+    """
+    content = []
+    for i, (text, image_path) in enumerate(zip(texts, image_paths)):
+        content.append({"type": "text", "text": f"<<<PAGE {i + 1}>>>\n{text}"})
+        content.append(image_content_block(image_path))
+    messages = [
+        {"role": "system", "content": TRANSLATOR_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+        {"role": "user", "content": content},
+    ]
+    max_tokens = estimate_batch_max_tokens(texts, TRANSLATION_EXPANSION)
+    response = groq_completion(messages, max_tokens=max_tokens)
+    # Splitting on the captured page number yields [preamble, n1, page1, n2, page2, ...]
+    parts = re.split(Patterns.MATCH_PAGE_DELIMITERS, response, flags=re.MULTILINE)
+    page_numbers = [int(number) for number in parts[1::2]]
+    if page_numbers != list(range(1, len(texts) + 1)):
+        raise ValueError(
+            f"Expected translated pages 1-{len(texts)} in order, got {page_numbers}"
+        )
+    return [page.strip() for page in parts[2::2]]
+
+
+def translate_pages(
+    contents: List[str],
+    image_paths: List[str],
+    target_language: str,
+    output_paths: List[str],
+) -> List[str]:
+    """Translate pages with one request, falling back to per-page translation on failure."""
+    try:
+        translations = translate_texts_batch(contents, image_paths, target_language)
+    except Exception as error:
+        logger.error(f"Error in batch translation: {error}")
+        return [
+            translate_page(content, image_path, target_language, output_path)
+            for content, image_path, output_path in zip(
+                contents, image_paths, output_paths
+            )
+        ]
+    for translated_content, output_path in zip(translations, output_paths):
+        with open(output_path, "w") as f:
+            f.write(translated_content)
+    return translations
+
+
+def combine_text(ocr_text: str) -> str:
+    """Combine the text extracted from a page into a single prompt input."""
+    return f"OCR Text:\n{ocr_text}"
+
+
+def process_page(
+    image_path: str,
+    output_path: str,
+    ocr_text: Optional[str] = None,
+    ocr_confidence: Optional[float] = None,
+    initial_markdown: Optional[str] = None,
+) -> str:
+    """Process a single page of a PDF.
+
+    `ocr_text`, `ocr_confidence` and `initial_markdown` may be supplied when
+    they were already produced for a batch of pages; otherwise they are
+    computed here.
+    """
     try:
         logger.info(f"Processing page: {image_path}")
         # Step 1: OCR and AI Image Reading
-        ocr_text = ocr_image(image_path)
+        if ocr_text is None:
+            ocr_text, ocr_confidence = ocr_image_with_confidence(image_path)
 
         # Combine the results
-        combined_text = f"OCR Text:\n{ocr_text}"
+        combined_text = combine_text(ocr_text)
 
         # Step 2: Initial Markdown Conversion
-        initial_markdown = initial_markdown_conversion(combined_text, image_path)
-
-        # Step 3: Chain of Feedback
-        improved_markdown = initial_markdown
-        for i in range(1):  # Perform feedback loop twice
-            logger.info(f"Feedback loop iteration {i + 1}")
-            improved_markdown = feedback_loop(combined_text, improved_markdown)
-
-        # Step 4: Create Final Version
-        final_version = create_final_version(improved_markdown, image_path)
+        if initial_markdown is None:
+            initial_markdown = initial_markdown_conversion(combined_text, image_path)
+
+        if ocr_confidence is not None and ocr_confidence >= ocr_confidence_threshold:
+            # Clean scan, the initial conversion is good enough
+            logger.info(
+                f"OCR confidence {ocr_confidence} for {image_path}, skipping feedback loop"
+            )
+            final_version = initial_markdown
+        else:
+            # Step 3: Chain of Feedback
+            improved_markdown = initial_markdown
+            for i in range(1):  # Perform feedback loop twice
+                logger.info(f"Feedback loop iteration {i + 1}")
+                improved_markdown = feedback_loop(combined_text, improved_markdown)
+
+            # Step 4: Create Final Version
+            final_version = create_final_version(improved_markdown, image_path)
 
         # Save the results
         with open(output_path, "w") as f:
@@ -237,6 +455,87 @@ def process_page(image_path: str, output_path: str) -> str:
         return ""
 
 
+def try_initial_markdown_conversion_batch(
+    ocr_texts: List[str], image_paths: List[str]
+) -> List[Optional[str]]:
+    """Convert a batch of pages, returning None for each page if the batch fails."""
+    if len(image_paths) == 1:
+        # A single page is cheaper to convert directly in `process_page`
+        return [None]
+    try:
+        return initial_markdown_conversion_batch(
+            [combine_text(text) for text in ocr_texts], image_paths
+        )
+    except Exception as error:
+        logger.error(f"Error in batch markdown conversion: {error}")
+        return [None] * len(image_paths)
+
+
+def initial_markdown_conversions(
+    executor: ThreadPoolExecutor, ocr_texts: List[str], image_paths: List[str]
+) -> List[Optional[str]]:
+    """Convert pages in concurrent batches of up to MARKDOWN_BATCH_SIZE.
+
+    Batches are also split so their combined output fits in groq_max_tokens.
+    Pages of a batch that fails are returned as None so they are converted
+    one by one in `process_page`.
+    """
+    combined_texts = [combine_text(text) for text in ocr_texts]
+    chunks = token_budget_chunks(combined_texts, MARKDOWN_BATCH_SIZE)
+    batches = executor.map(
+        try_initial_markdown_conversion_batch,
+        [ocr_texts[chunk] for chunk in chunks],
+        [image_paths[chunk] for chunk in chunks],
+    )
+    return [markdown for batch in batches for markdown in batch]
+
+
+def chunked(items: List[Any], size: int) -> Iterator[List[Any]]:
+    """Yield successive chunks of `size` items."""
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def process_pages(
+    executor: ThreadPoolExecutor,
+    pages: List[Tuple[str, Future]],
+    output_paths: List[str],
+    translated_output_paths: List[str],
+    target_language: str,
+):
+    """Convert and translate a batch of pages whose OCR was already submitted."""
+    image_paths = [image_path for image_path, _ in pages]
+    ocr_results = []
+    for image_path, future in pages:
+        try:
+            ocr_results.append(future.result())
+        except Exception as error:
+            # The page is still converted from its image alone
+            logger.error(f"Error performing OCR on {image_path}: {error}")
+            ocr_results.append(("", None))
+    ocr_texts, ocr_confidences = zip(*ocr_results)
+    initial_markdowns = initial_markdown_conversions(executor, ocr_texts, image_paths)
+    markdown_texts = list(
+        executor.map(
+            process_page,
+            image_paths,
+            output_paths,
+            ocr_texts,
+            ocr_confidences,
+            initial_markdowns,
+        )
+    )
+    list(
+        executor.map(
+            translate_pages,
+            chunked(markdown_texts, TRANSLATION_BATCH_SIZE),
+            chunked(image_paths, TRANSLATION_BATCH_SIZE),
+            itertools.repeat(target_language),
+            chunked(translated_output_paths, TRANSLATION_BATCH_SIZE),
+        )
+    )
+
+
 def main():
     file_name = "file.pdf"
     data = "./data"
@@ -244,20 +543,47 @@ def main():
     images_path = f"{data}/{file_name.split('.')[0]}/images"
     markdowns_path = f"{data}/{file_name.split('.')[0]}/markdowns"
     translations_path = f"{data}/{file_name.split('.')[0]}/translations"
+    target_language = "English"
     os.makedirs(data, exist_ok=True)
     os.makedirs(images_path, exist_ok=True)
     os.makedirs(markdowns_path, exist_ok=True)
     os.makedirs(translations_path, exist_ok=True)
     logger.info(f"Starting processing of PDF: {file_path}")
-    images = convert_from_path(file_path, output_folder=images_path)
-    for i, image in enumerate(images):
-        image_path = f"{images_path}/page_{i + 1}.png"
-        image.save(image_path, "PNG")
-        output_path = f"{markdowns_path}/page_{i + 1}.md"
-        markdown_text = process_page(image_path, output_path)
-        translated_output_path = f"{translations_path}/page_{i + 1}.md"
-        translate_page(markdown_text, image_path, "English", translated_output_path)
-
+    image_chunks = iter_pdf_image_chunks(file_path, images_path)
+
+    render_executor = ThreadPoolExecutor(max_workers=1)
+    ocr_executor = ThreadPoolExecutor(max_workers=OCR_WORKERS)
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+    def render_next_chunk() -> List[Tuple[str, Future]]:
+        """Render the next chunk of pages and submit them for OCR."""
+        image_paths = next(image_chunks, [])
+        return [
+            (image_path, ocr_executor.submit(ocr_image_with_confidence, image_path))
+            for image_path in image_paths
+        ]
+
+    page_count = 0
+    with render_executor, ocr_executor, executor:
+        # Each rendered chunk is processed as one batch, bounding Groq rate-limit
+        # pressure. The next chunk is rendered and OCR'd while this one waits on
+        # the API.
+        next_chunk = render_executor.submit(render_next_chunk)
+        while pages := next_chunk.result():
+            next_chunk = render_executor.submit(render_next_chunk)
+            page_numbers = range(page_count + 1, page_count + len(pages) + 1)
+            process_pages(
+                executor,
+                pages,
+                [f"{markdowns_path}/page_{n}.md" for n in page_numbers],
+                [f"{translations_path}/page_{n}.md" for n in page_numbers],
+                target_language,
+            )
+            page_count += len(pages)
+
+    if not page_count:
+        logger.error(f"No pages were extracted from {file_path}")
+        return
     logger.info("PDF processing complete")
 
 
@@ -0,0 +1,79 @@
+import functools
+import hashlib
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List
+
+import orjson
+
+DEFAULT_CACHE_DIR = "./data/.groq_cache"
+
+
+def completion_cache_key(
+    model: str, messages: List[Dict[str, Any]], options: Dict[str, Any] = None
+) -> str:
+    """Compute a stable cache key for a model, its messages and request options."""
+    key_data = {"m": model, "msgs": messages}
+    if options:
+        key_data["opts"] = options
+    payload = orjson.dumps(key_data, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _strip_images(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Replace inline image data with a placeholder so stored prompts stay readable."""
+    stripped = []
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, list):
+            content = [
+                (
+                    {"type": "image_url", "image_url": {"url": "<image>"}}
+                    if block.get("type") == "image_url"
+                    else block
+                )
+                for block in content
+            ]
+        stripped.append({**message, "content": content})
+    return stripped
+
+
+def _write_atomic(path: str, data: str):
+    """Write data to path without exposing partially written files."""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def cached_completion(model: str, cache_dir: str = DEFAULT_CACHE_DIR) -> Callable:
+    """Cache completion responses on disk, keyed on the model, messages and options."""
+
+    def decorator(func: Callable[..., str]):
+        @functools.wraps(func)
+        def wrapper(messages: List[Dict[str, Any]], **options: Any) -> str:
+            key = completion_cache_key(model, messages, options)
+            response_path = os.path.join(cache_dir, f"{key}.txt")
+            if os.path.exists(response_path):
+                logging.info(f"Groq cache hit: {key}")
+                with open(response_path) as f:
+                    return f.read()
+
+            response = func(messages, **options)
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                _write_atomic(
+                    os.path.join(cache_dir, f"{key}.prompt.json"),
+                    orjson.dumps(
+                        _strip_images(messages), option=orjson.OPT_INDENT_2
+                    ).decode("utf-8"),
+                )
+                _write_atomic(response_path, response)
+            except OSError as err:
+                logging.error(f"Error writing Groq cache entry {key}: {err}")
+            return response
+
+        return wrapper
+
+    return decorator
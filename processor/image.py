@@ -1,12 +1,31 @@
 import base64
+import functools
 import io
 
+import cv2
+import numpy as np
+from PIL import Image
+
+
+# Vision models tile their input at a fixed resolution, so larger images only add upload size
+LLM_IMAGE_MAX_SIZE = (1600, 1600)
+LLM_IMAGE_JPEG_QUALITY = 85
+
+
+@functools.lru_cache(maxsize=32)
+def encode_image_for_llm(image_path: str) -> str:
+    """Downscale an image and encode it as a base64 JPEG for the vision LLM.
+
+    Results are memoized per path since each page image is sent with several requests.
+    """
+    with Image.open(image_path) as image:
+        image = image.convert("RGB")
+    image.thumbnail(LLM_IMAGE_MAX_SIZE, Image.LANCZOS)
+    with io.BytesIO() as buffer:
+        image.save(buffer, format="JPEG", quality=LLM_IMAGE_JPEG_QUALITY)
+        with buffer.getbuffer() as view:
+            return base64.b64encode(view).decode("ascii")
 
-def encode_image_to_base64(image_path: str) -> str:
-    """Encode an image to base64 asynchronously."""
-    with open(image_path, "rb") as image_file:
-        image_data = image_file.read()
-    return base64.b64encode(image_data).decode("utf-8")
 
 def save_image(image, image_path: str):
     """Save an image to a file."""
@@ -18,3 +37,17 @@ def save_image(image, image_path: str):
     # Write image data to file
     with open(image_path, "wb") as f:
         f.write(image_data)
+
+
+def preprocess_for_ocr(image_path: str) -> np.ndarray:
+    """Load an image as grayscale and binarize it with an adaptive threshold for OCR.
+
+    Returns the raw 8-bit pixel array so it can be handed to Tesseract without re-encoding.
+    """
+    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"Could not read image: {image_path}")
+    binary_image = cv2.adaptiveThreshold(
+        image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 10
+    )
+    return binary_image
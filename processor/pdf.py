@@ -1,34 +1,66 @@
 import logging
-from typing import List
-from pdf2image import convert_from_path
+from typing import Iterator, List
+from pdf2image import convert_from_path, pdfinfo_from_path
 
 class PDFConversionDefaultOptions:
     """Default options for converting PDFs to images"""
 
-    DPI = 300
+    DPI = 200
     FORMAT = "png"
-    SIZE = (None, 1056)
     THREAD_COUNT = 4
     USE_PDFTOCAIRO = True
+    PAGE_CHUNK_SIZE = 10
 
 
-def convert_pdf_to_images(local_path: str, temp_dir: str) -> List[str]:
-    """Converts a PDF file to a series of images in the temp_dir. Returns a list of image paths in page order."""
+def iter_pdf_image_chunks(local_path: str, temp_dir: str) -> Iterator[List[str]]:
+    """Converts a PDF file to a series of images in the temp_dir. Yields image paths in page order.
+
+    Pages are rendered in chunks of PAGE_CHUNK_SIZE so callers can start on the
+    first pages before the rest of the document is rendered. Conversion errors
+    are raised so remaining pages are never silently dropped.
+    """
     options = {
         "pdf_path": local_path,
         "output_folder": temp_dir,
         "dpi": PDFConversionDefaultOptions.DPI,
         "fmt": PDFConversionDefaultOptions.FORMAT,
-        "size": PDFConversionDefaultOptions.SIZE,
         "thread_count": PDFConversionDefaultOptions.THREAD_COUNT,
         "use_pdftocairo": PDFConversionDefaultOptions.USE_PDFTOCAIRO,
         "paths_only": True,
     }
 
+    page_count = pdfinfo_from_path(local_path)["Pages"]
+    chunk_size = PDFConversionDefaultOptions.PAGE_CHUNK_SIZE
+    for first_page in range(1, page_count + 1, chunk_size):
+        last_page = min(first_page + chunk_size - 1, page_count)
+        try:
+            # A deterministic prefix per chunk overwrites images from earlier runs
+            image_paths = convert_from_path(
+                **options,
+                first_page=first_page,
+                last_page=last_page,
+                output_file=f"page_{first_page:05d}_",
+            )
+            # pdf2image does not raise when poppler fails, it returns fewer pages
+            if len(image_paths) != last_page - first_page + 1:
+                raise Exception(
+                    f"Expected {last_page - first_page + 1} pages, got {len(image_paths)}"
+                )
+        except Exception as err:
+            logging.error(
+                f"Error converting pages {first_page}-{page_count} to images: {err}"
+            )
+            raise
+        yield image_paths
+
+
+def convert_pdf_to_images(local_path: str, temp_dir: str) -> List[str]:
+    """Converts a PDF file to a series of images in the temp_dir. Returns a list of image paths in page order."""
     try:
-        image_paths = convert_from_path(**options)
-        return image_paths
+        return [
+            image_path
+            for image_paths in iter_pdf_image_chunks(local_path, temp_dir)
+            for image_path in image_paths
+        ]
     except Exception as err:
         logging.error(f"Error converting PDF to images: {err}")
-
-